@@ -4,33 +4,99 @@ Command-line interface for the GifSplit tool, allowing batch processing and auto
 
 Features:
 - Crop GIFs to specific dimensions
-- Optional circular cropping
-- Grid-based splitting
+- Optional circular, rounded-rectangle or custom image masks
+- Grid-based splitting, including uneven and non-uniform grids
 - Size optimization
 - Output resizing with aspect ratio preservation
+- Sprite-sheet (texture atlas) output with a JSON frame index
 """
 
 import argparse
-from gif_processor import GifProcessor
+import os
+from gif_processor import (GifPipeline, GifProcessor, JobManifest, ResourceLimitError, ResourceLimits,
+                           RESIZE_BACKENDS)
+
+def parse_bounds(value):
+    """Parse a comma separated list of tile edges (e.g. 0,50,120,200)."""
+    return [int(edge) for edge in value.split(',')]
+
+def job_params(args):
+    """Settings that determine the output tiles, used to validate a resume manifest."""
+    params = {key: value for key, value in vars(args).items()
+              if key not in ('output', 'resume', 'workers', 'queue_size')}
+    stat = os.stat(args.input)
+    params['input_stat'] = [stat.st_size, stat.st_mtime_ns]
+    return params
 
 def main():
     """Process GIF files according to command-line arguments."""
     # Set up command-line argument parser with detailed help messages
     parser = argparse.ArgumentParser(description='Split and process GIF files')
     parser.add_argument('--input', required=True, help='Input GIF file')
-    parser.add_argument('--output', required=True, help='Output directory')
+    parser.add_argument('--output', default=None, help='Output directory (not needed with --preview-out)')
     parser.add_argument('--width', type=int, default=200, help='Selection width')
     parser.add_argument('--height', type=int, default=200, help='Selection height')
     parser.add_argument('--out_width', type=int, default=None, help='Target width')
     parser.add_argument('--out_height', type=int, default=None, help='Target height')
+    parser.add_argument('--resize-backend', default='auto',
+                      choices=['auto'] + [backend.name for backend in RESIZE_BACKENDS],
+                      help='Resampling backend; auto picks the fastest one installed')
     parser.add_argument('--grid', default='2x2', help='Grid size (e.g., 2x2)')
+    parser.add_argument('--remainder', choices=GifProcessor.REMAINDER_MODES, default='drop',
+                      help='How to handle pixels left over when the grid does not divide the size evenly')
+    parser.add_argument('--row-bounds', type=parse_bounds, default=None,
+                      help='Explicit row edges in output pixels (e.g., 0,40,100), overrides grid rows')
+    parser.add_argument('--col-bounds', type=parse_bounds, default=None,
+                      help='Explicit column edges in output pixels (e.g., 0,50,120,200), overrides grid columns')
     parser.add_argument('--circular', action='store_true', help='Crop the GIF into a circle')
+    parser.add_argument('--mask', choices=GifProcessor.MASK_SHAPES, default=None,
+                      help='Mask the GIF with an ellipse, rounded rectangle or custom image')
+    parser.add_argument('--corner-radius', type=int, default=20,
+                      help='Corner radius in pixels for the rounded mask')
+    parser.add_argument('--mask-image', default=None,
+                      help='Grayscale mask image for the image mask (white = keep)')
     parser.add_argument('--max-size', type=int, default=500,
                       help='Maximum size per chunk in KB')
     parser.add_argument('--left', type=int, default=0, help='Left position')
     parser.add_argument('--top', type=int, default=0, help='Top position')
+    parser.add_argument('--format', choices=['gif', 'atlas'], default='gif',
+                      help='Output GIF chunks or PNG sprite sheets with a JSON index')
+    parser.add_argument('--atlas-mode', choices=['tile', 'all'], default='tile',
+                      help='Pack one atlas per tile or all tiles together')
+    parser.add_argument('--atlas-max-size', type=int, default=4096,
+                      help='Maximum sprite sheet width/height in pixels')
+    parser.add_argument('--pipeline', action='store_true',
+                      help='Stream frames through overlapping decode/transform/encode stages '
+                           '(GIF output only, skips size optimization)')
+    parser.add_argument('--workers', type=int, default=None,
+                      help='Transform threads for --pipeline (default: based on CPU count)')
+    parser.add_argument('--queue-size', type=int, default=8,
+                      help='Frames buffered between --pipeline stages')
+    parser.add_argument('--skip-static', action='store_true',
+                      help='Write tiles that never change as single-frame GIFs and leave them out of size optimization')
+    parser.add_argument('--preview-out', default=None,
+                      help='Only render an annotated preview to this base path (.png poster and .gif animation)')
+    parser.add_argument('--preview-fps', type=int, default=5,
+                      help='Frame rate of the preview animation')
+    parser.add_argument('--preview-size', type=int, default=320,
+                      help='Longest side of the preview in pixels')
+    parser.add_argument('--max-frame-pixels', type=int, default=None,
+                      help='Reject inputs whose frames have more pixels than this')
+    parser.add_argument('--max-total-pixels', type=int, default=None,
+                      help='Limit on decoded pixels across all frames')
+    parser.add_argument('--max-frames', type=int, default=None,
+                      help='Limit on the number of frames')
+    parser.add_argument('--max-memory-mb', type=int, default=None,
+                      help='Limit on the estimated working set in MB')
+    parser.add_argument('--over-limit', choices=['fail', 'reduce'], default='fail',
+                      help='When totals are over a limit, fail or load fewer, downscaled frames that fit')
+    parser.add_argument('--resume', action='store_true',
+                      help='Skip tiles a previous run with the same settings already finished '
+                           '(every GIF run records its progress in manifest.json)')
     
     args = parser.parse_args()
+    if not args.output and not args.preview_out:
+        parser.error("--output is required unless --preview-out is given")
     
     try:
         # Parse grid dimensions
@@ -38,17 +104,9 @@ def main():
         
         print(f"Processing {args.input}...")
 
-        # Initialize GIF processor
-        processor = GifProcessor(args.input)
-
-        # Step 1: Crop to selection rectangle
-        print(" Cropping to rectangle...")
-        processor.crop_to_rect(args.left, args.top, args.width, args.height)
-        
-        # Step 2: Resize output if dimensions specified
+        # Calculate missing output dimension to maintain aspect ratio
+        output_size = None
         if args.out_width or args.out_height:
-            print(" Resizing GIF...")
-            # Calculate missing dimension to maintain aspect ratio
             aspect = args.width / args.height
             out_width = args.out_width
             out_height = args.out_height
@@ -56,24 +114,149 @@ def main():
                 out_width = int(out_height * aspect)
             if not out_height:
                 out_height = int(out_width / aspect)
+            output_size = (out_width, out_height)
+
+        mask = 'ellipse' if args.circular else args.mask
+
+        # Admission control from the GIF headers, before anything is decoded
+        limits = None
+        if any(limit is not None for limit in (args.max_frame_pixels, args.max_total_pixels,
+                                               args.max_frames, args.max_memory_mb)):
+            limits = ResourceLimits(
+                max_frame_pixels=args.max_frame_pixels,
+                max_total_pixels=args.max_total_pixels,
+                max_frames=args.max_frames,
+                max_bytes=args.max_memory_mb * 2**20 if args.max_memory_mb is not None else None
+            )
+            try:
+                limits.check(args.input)
+            except ResourceLimitError as e:
+                # The preview only decodes a bounded number of small frames anyway
+                if not (e.reducible and (args.preview_out or args.over_limit == 'reduce')):
+                    raise
+                if not args.preview_out:
+                    if args.pipeline:
+                        raise ValueError(f"{e}; --pipeline cannot reduce over-limit inputs")
+                    print(f" {e}, loading fewer/smaller frames to fit")
+
+        if args.preview_out:
+            # Imported here so regular runs don't pay for it
+            from gif_preview import render_preview
+            print(" Rendering preview...")
+            poster_path, animation_path = render_preview(
+                args.input, args.preview_out,
+                (args.left, args.top, args.width, args.height),
+                rows, cols,
+                mask=mask,
+                mask_radius=args.corner_radius,
+                mask_path=args.mask_image,
+                output_size=output_size,
+                remainder=args.remainder,
+                row_bounds=args.row_bounds,
+                col_bounds=args.col_bounds,
+                max_dim=args.preview_size,
+                fps=args.preview_fps
+            )
+            print(f"Done! Preview saved to: {poster_path}, {animation_path}")
+            return
 
-            processor.resize(out_width, out_height)
+        # GIF runs always record a manifest so an interrupted run can be
+        # resumed; --resume only decides whether an existing one is trusted
+        manifest = None
+        if args.resume and args.format != 'gif':
+            raise ValueError("--resume only supports GIF output")
+        if args.format == 'gif':
+            manifest = JobManifest(args.output, job_params(args), resume=args.resume)
+        if args.resume:
+            tile_rows = len(args.row_bounds) - 1 if args.row_bounds else rows
+            tile_cols = len(args.col_bounds) - 1 if args.col_bounds else cols
+            if all(manifest.is_done(f'chunk_{row_idx}_{col_idx}.gif')
+                   for row_idx in range(tile_rows)
+                   for col_idx in range(tile_cols)):
+                print("All tiles already done, nothing to resume.")
+                return
+
+        if args.pipeline:
+            if args.format != 'gif':
+                raise ValueError("--pipeline only supports GIF output")
+            if args.skip_static:
+                raise ValueError("--skip-static is not supported with --pipeline")
+            print(" Streaming frames through the pipeline...")
+            pipeline = GifPipeline(
+                rows, cols,
+                rect=(args.left, args.top, args.width, args.height),
+                output_size=output_size,
+                mask=mask,
+                mask_radius=args.corner_radius,
+                mask_path=args.mask_image,
+                remainder=args.remainder,
+                row_bounds=args.row_bounds,
+                col_bounds=args.col_bounds,
+                workers=args.workers,
+                queue_size=args.queue_size,
+                resize_backend=args.resize_backend
+            )
+            pipeline.run(args.input, args.output, manifest)
+            print("Done!")
+            return
+
+        # Initialize GIF processor
+        processor = GifProcessor(args.input, resize_backend=args.resize_backend,
+                                 limits=limits, over_limit=args.over_limit)
+        if processor.decoded_size:
+            print(f"  Decoded every {processor.frame_step} frame(s) at "
+                  f"{processor.decoded_size[0]}x{processor.decoded_size[1]}")
+
+        # Step 1: Crop to selection rectangle
+        print(" Cropping to rectangle...")
+        processor.crop_to_rect(args.left, args.top, args.width, args.height)
         
-        # Step 3: Apply circular crop if requested
+        # Step 2: Resize output if dimensions specified
+        if output_size:
+            print(" Resizing GIF...")
+            processor.resize(*output_size)
+            print(f"  Resize backend: {processor.resize_backend}")
+        
+        # Step 3: Apply circular crop or custom mask if requested
         if args.circular:
             print(" Creating circular crop...")
             processor.crop_circle()
+        elif mask:
+            print(f" Applying {mask} mask...")
+            processor.apply_mask(mask, args.corner_radius, args.mask_image)
         
         # Step 4: Split into grid
         print(" Splitting frames...")
-        chunks = processor.split_gif(rows, cols)
+        chunks = processor.split_gif(rows, cols, args.remainder,
+                                     row_bounds=args.row_bounds, col_bounds=args.col_bounds)
+
+        states = None
+        if args.skip_static and args.format == 'gif':
+            print(" Detecting static tiles...")
+            states = processor.classify_chunks(rows, cols, args.remainder,
+                                               row_bounds=args.row_bounds, col_bounds=args.col_bounds)
+            for state in ('static', 'mostly_static', 'dynamic'):
+                print(f"  {state}: {sum(row.count(state) for row in states)}")
         
         # Step 5: Optimize and save chunks
-        print(" Optimizing chunks...")
-        chunks = processor.optimize_chunks(chunks, args.max_size)
-        
-        print(" Saving chunks...")
-        processor.save_chunks(chunks, args.output)
+        if args.format == 'atlas':
+            print(" Packing sprite sheets...")
+            processor.save_sprite_sheets(chunks, args.output,
+                                         per_tile=args.atlas_mode == 'tile',
+                                         max_sheet_size=args.atlas_max_size)
+        else:
+            if manifest and manifest.quality is not None:
+                # Same settings as the interrupted run, so its quality still holds
+                processor.optimal_quality = manifest.quality
+            else:
+                print(" Optimizing chunks...")
+                chunks = processor.optimize_chunks(chunks, args.max_size, states)
+                if manifest:
+                    manifest.quality = processor.optimal_quality
+                    manifest.save()
+
+            print(" Saving chunks...")
+            processor.save_chunks(chunks, args.output, manifest, states)
         
         print("Done!")
         
@@ -15,7 +15,8 @@ import tkinter as tk
 from tkinter import ttk, filedialog
 from PIL import Image, ImageTk
 import os
-from gif_processor import GifProcessor
+import threading
+from gif_processor import GifProcessor, ProcessingSession, ResourceLimits
 
 class Main(tk.Tk):
     """Main application window for GIFshine."""
@@ -120,6 +121,12 @@ class Main(tk.Tk):
         self.cols_spin.grid(row=2, column=5, padx=(5))
         self.cols_var.trace_add('write', lambda *args: self.update_grid())
         
+        ttk.Label(pos_frame, text="Remainder:").grid(row=4, column=0, columnspan=2, padx=5, sticky='w')
+        self.remainder_var = tk.StringVar(value='drop')
+        ttk.Combobox(pos_frame, textvariable=self.remainder_var, values=GifProcessor.REMAINDER_MODES,
+                     state='readonly', width=10).grid(row=4, column=2, columnspan=2, sticky='w')
+        self.remainder_var.trace_add('write', lambda *args: self.update_grid())
+        
         # Options frame
         options_frame = ttk.LabelFrame(main_container, text="Options", padding="5")
         options_frame.pack(fill='x', pady=(0, 10))
@@ -136,6 +143,7 @@ class Main(tk.Tk):
         self.max_size_var = tk.IntVar(value=500)
         self.max_size_spin = ttk.Spinbox(options_frame, from_=1, to=10000, width=5, textvariable=self.max_size_var)
         self.max_size_spin.grid(row=1, column=1, padx=5)
+        self.max_size_var.trace_add('write', lambda *args: self.update_grid())
         
         self.update_optimize()
         
@@ -155,6 +163,11 @@ class Main(tk.Tk):
         self.output_height_var = tk.IntVar(value=100)
         self.output_height_spin = ttk.Spinbox(options_frame, from_=1, to=10000, width=5, textvariable=self.output_height_var)
         self.output_height_spin.grid(row=1, column=6, padx=5)
+        
+        # Output size moves the remainder pixels, so keep the grid in sync
+        self.resize_var.trace_add('write', lambda *args: self.update_grid())
+        self.output_width_var.trace_add('write', lambda *args: self.update_grid())
+        self.output_height_var.trace_add('write', lambda *args: self.update_grid())
 
         self.update_resize()
 
@@ -177,6 +190,13 @@ class Main(tk.Tk):
         # Initialize variables
         self.preview_window = None
         self.selected_file = None
+        self.session = ProcessingSession()
+        
+        # Coalesced selection updates (see schedule_update)
+        self.frame_interval = 16  # ms, roughly one display frame
+        self.update_job = None
+        self.pending_coords = None
+        self.pending_redraw = False
         
     def select_file(self):
         """Open file dialog for selecting a GIF file."""
@@ -223,6 +243,29 @@ class Main(tk.Tk):
         else:
             self.preview_window.on_closing()
             
+    def schedule_update(self, coords=None, redraw=True):
+        """Queue a selection update, coalescing bursts into one per display frame.
+        
+        Args:
+            coords: Selection coordinates to push into the spinboxes, if any
+            redraw: Whether the preview selection and grid need redrawing
+        """
+        if coords is not None:
+            self.pending_coords = list(coords)
+        self.pending_redraw = self.pending_redraw or redraw
+        if self.update_job is None:
+            self.update_job = self.after(self.frame_interval, self.flush_updates)
+            
+    def flush_updates(self):
+        """Apply the latest queued spinbox values and redraw the preview once."""
+        self.update_job = None
+        coords, self.pending_coords = self.pending_coords, None
+        redraw, self.pending_redraw = self.pending_redraw, False
+        if coords:
+            self.update_spinboxes(coords)
+        if redraw and self.preview_window:
+            self.preview_window.draw_selection()
+
     def update_spinboxes(self, coords):
         """Update spinbox values based on selection coordinates."""
         if coords:
@@ -253,12 +296,12 @@ class Main(tk.Tk):
     def update_grid(self):
         """Update the grid overlay in the preview window."""
         if self.preview_window:
-            self.preview_window.draw_grid()
+            self.schedule_update()
             
     def update_selection(self):
         """Update the selection rectangle in the preview window."""
         if self.preview_window:
-            self.preview_window.draw_selection()
+            self.schedule_update()
             
     def update_selection_from_inputs(self, source, *args):
         """Update the selection rectangle based on input field changes.
@@ -279,14 +322,19 @@ class Main(tk.Tk):
             x = self.x_var.get()
             y = self.y_var.get()
             
-            # Maintain aspect ratio if checked
+            # Maintain aspect ratio if checked; guard the write so the
+            # paired spinbox trace doesn't bounce the update back here
             if self.maintain_ratio_var.get():
-                if source == 'width':
-                    height = width * self.aspect_ratio
-                    self.height_var.set(height)
-                if source == 'height':
-                    width = height / self.aspect_ratio
-                    self.width_var.set(width)
+                self.update_from_ui = True
+                try:
+                    if source == 'width':
+                        height = width * self.aspect_ratio
+                        self.height_var.set(height)
+                    if source == 'height':
+                        width = height / self.aspect_ratio
+                        self.width_var.set(width)
+                finally:
+                    self.update_from_ui = False
 
             if self.preview_window and self.preview_window.crop_rect:   
                 # Update the selection
@@ -294,7 +342,7 @@ class Main(tk.Tk):
                     self.preview_window.crop_rect,
                     x, y, x + width, y + height
                 )
-                self.preview_window.draw_selection()
+                self.schedule_update()
         except tk.TclError:
             # This happens when the input is empty or invalid
             pass
@@ -309,32 +357,25 @@ class Main(tk.Tk):
         self.process_button.config(state='disabled')
         
         try:
-            processor = GifProcessor(self.selected_file)
-            
-            # Crop
-            processor.crop_to_rect(
-                self.x_var.get(),
-                self.y_var.get(),
-                self.width_var.get(),
-                self.height_var.get()
-            )
-
-            # Resize
+            # Crop, resize, circelify, split and optimize, reusing
+            # any stage whose settings did not change since the last run
+            output_size = None
             if self.resize_var.get():
-                processor.resize(self.output_width_var.get(), self.output_height_var.get())
-                
-            # Circelify
-            if self.circular_var.get():
-                processor.crop_circle()
-            
-
-            # Split and process
-            chunks = processor.split_gif(self.rows_var.get(), self.cols_var.get())
-            chunks = processor.optimize_chunks(chunks, self.max_size_var.get())
+                output_size = (self.output_width_var.get(), self.output_height_var.get())
+            chunks = self.session.run(
+                self.selected_file,
+                (self.x_var.get(), self.y_var.get(), self.width_var.get(), self.height_var.get()),
+                self.rows_var.get(),
+                self.cols_var.get(),
+                self.max_size_var.get(),
+                output_size=output_size,
+                circular=self.circular_var.get(),
+                remainder=self.remainder_var.get()
+            )
             
             # Save
             output_dir = self.output_var.get()
-            processor.save_chunks(chunks, output_dir)
+            self.session.processor.save_chunks(chunks, output_dir)
             
             self.status_label.config(text=f"Done! Files saved to: {output_dir}")
             
@@ -387,6 +428,17 @@ class PreviewWindow(tk.Toplevel):
         self.dragging = False
         self.moving = False
         self.start_pos = None
+        
+        # Background size estimate state
+        self.gif_path = None
+        self.estimate_delay = 400  # ms of quiet before re-estimating
+        self.estimate_frames = 8  # frames sampled per estimate
+        self.estimate_key = None
+        self.estimate_job = None
+        self.estimate_result = None
+        self.estimates = None
+        self.estimate_sample = None  # (frames, durations, total frame count)
+        self.estimate_lock = threading.Lock()
 
     def check_resize_edge(self, event, coords):
         """Check which edges or corners are being clicked for resizing.
@@ -532,8 +584,7 @@ class PreviewWindow(tk.Toplevel):
                 
                 # Update selection
                 self.canvas.coords(self.crop_rect, *coords)
-                self.master.update_spinboxes(coords)
-                self.draw_selection()
+                self.master.schedule_update(coords)
             else:  # Drawing new selection
                 width = abs(event.x - self.start_pos[0])
                 height = abs(event.y - self.start_pos[1])
@@ -553,8 +604,7 @@ class PreviewWindow(tk.Toplevel):
                 
                 # Update selection
                 self.canvas.coords(self.crop_rect, x1, y1, x2, y2)
-                self.master.update_spinboxes([x1, y1, x2, y2])
-                self.draw_selection()
+                self.master.schedule_update([x1, y1, x2, y2])
         elif self.moving and self.start_pos:  # Moving the selection
             dx = event.x - self.start_pos[0]
             dy = event.y - self.start_pos[1]
@@ -567,14 +617,13 @@ class PreviewWindow(tk.Toplevel):
             
             # Update selection
             self.canvas.coords(self.crop_rect, new_x1, new_y1, new_x2, new_y2)
-            self.master.update_spinboxes([new_x1, new_y1, new_x2, new_y2])
-            self.draw_selection()
+            self.master.schedule_update([new_x1, new_y1, new_x2, new_y2])
             
     def on_release(self, event):
         """Handle mouse button release events."""
         if self.crop_rect:
             coords = self.canvas.coords(self.crop_rect)
-            self.master.update_spinboxes(coords)
+            self.master.schedule_update(coords)
         self.dragging = False
         self.moving = False
         self.start_pos = None
@@ -589,9 +638,8 @@ class PreviewWindow(tk.Toplevel):
             self.canvas.delete("gif")
             # Draw image with lower z-order
             self.canvas.create_image(0, 0, anchor='nw', image=self.frames[self.current_frame], tags="gif")
-            # Make sure selection is always on top
-            if self.crop_rect:
-                self.draw_selection()
+            # Keep the selection and grid on top without redrawing them
+            self.canvas.tag_lower("gif")
             
     def draw_selection(self):
         """Draw the selection rectangle and grid overlay."""
@@ -631,27 +679,166 @@ class PreviewWindow(tk.Toplevel):
         # Remove old grid lines
         self.canvas.delete("grid")
         
+        # Tile edges follow the processor's remainder handling, measured in
+        # output pixels and mapped back onto the selection
+        col_edges, row_edges = self.get_grid_edges(coords, rows, cols)
+        
         # Draw vertical grid lines
-        cell_width = (coords[2] - coords[0]) / cols
-        for i in range(1, cols):
-            x = coords[0] + (cell_width * i)
+        for x in col_edges[1:-1]:
             self.canvas.create_line(
                 x, coords[1], x, coords[3],
                 fill='red', width=1, tags="grid"
             )
         
         # Draw horizontal grid lines
-        cell_height = (coords[3] - coords[1]) / rows
-        for i in range(1, rows):
-            y = coords[1] + (cell_height * i)
+        for y in row_edges[1:-1]:
             self.canvas.create_line(
                 coords[0], y, coords[2], y,
                 fill='red', width=1, tags="grid"
             )
+        
+        self.draw_estimates(coords, rows, cols, col_edges, row_edges)
+
+    def get_grid_edges(self, coords, rows, cols):
+        """Return the canvas x and y positions of the tile edges.
+        
+        Args:
+            coords: Current selection rectangle coordinates
+            rows: Number of grid rows
+            cols: Number of grid columns
+        """
+        sel_width = coords[2] - coords[0]
+        sel_height = coords[3] - coords[1]
+        out_width, out_height = sel_width, sel_height
+        try:
+            if self.master.resize_var.get():
+                out_width = max(1, self.master.output_width_var.get())
+                out_height = max(1, self.master.output_height_var.get())
+        except tk.TclError:
+            # Output size is being edited - fall back to the selection size
+            out_width, out_height = sel_width, sel_height
+        remainder = self.master.remainder_var.get()
+        
+        try:
+            col_bounds = GifProcessor.grid_bounds(int(out_width), cols, remainder)
+            row_bounds = GifProcessor.grid_bounds(int(out_height), rows, remainder)
+        except ValueError:
+            # Too few pixels to pad into this grid; processing will report it
+            col_bounds = GifProcessor.grid_bounds(int(out_width), cols)
+            row_bounds = GifProcessor.grid_bounds(int(out_height), rows)
+        col_edges = [coords[0] + min(edge * sel_width / out_width, sel_width) for edge in col_bounds]
+        row_edges = [coords[1] + min(edge * sel_height / out_height, sel_height) for edge in row_bounds]
+        return col_edges, row_edges
+
+    def draw_estimates(self, coords, rows, cols, col_edges, row_edges):
+        """Overlay the estimated output size of each cell, colored by whether it fits.
+        
+        Args:
+            coords: Current selection rectangle coordinates
+            rows: Number of grid rows
+            cols: Number of grid columns
+            col_edges: Canvas x positions of the tile edges
+            row_edges: Canvas y positions of the tile edges
+        """
+        key = self.get_estimate_key(coords, rows, cols)
+        if key != self.estimate_key:
+            # Settings changed - drop the stale estimate and debounce a new one
+            self.estimate_key = key
+            self.estimates = None
+            self.schedule_estimate()
+            return
+        if not self.estimates:
+            return
+            
+        try:
+            max_bytes = self.master.max_size_var.get() * 1024
+        except tk.TclError:
+            return
+        for row_idx, row in enumerate(self.estimates):
+            for col_idx, size in enumerate(row):
+                x1, x2 = col_edges[col_idx], col_edges[col_idx + 1]
+                y1, y2 = row_edges[row_idx], row_edges[row_idx + 1]
+                color = 'green' if size <= max_bytes else 'red'
+                self.canvas.create_rectangle(
+                    x1, y1, x2, y2,
+                    fill=color, stipple='gray25', width=0, tags="grid"
+                )
+                self.canvas.create_text(
+                    (x1 + x2) / 2, (y1 + y2) / 2,
+                    text=f"~{size / 1024:.0f} KB", fill=color, tags="grid"
+                )
+        self.canvas.tag_raise(self.crop_rect)
+
+    def get_estimate_key(self, coords, rows, cols):
+        """Collect the settings that affect the encoded tile sizes."""
+        master = self.master
+        try:
+            output_size = None
+            if master.resize_var.get():
+                output_size = (master.output_width_var.get(), master.output_height_var.get())
+            rect = (int(coords[0]), int(coords[1]), int(coords[2] - coords[0]), int(coords[3] - coords[1]))
+            return (rect, rows, cols, output_size, master.circular_var.get(), master.remainder_var.get())
+        except tk.TclError:
+            return None
+
+    def schedule_estimate(self):
+        """Restart the debounce timer for the background size estimate."""
+        if self.estimate_job:
+            self.after_cancel(self.estimate_job)
+        self.estimate_job = self.after(self.estimate_delay, self.start_estimate)
+
+    def start_estimate(self):
+        """Start estimating tile sizes for the current settings in a worker thread."""
+        self.estimate_job = None
+        if self.estimate_key is None or not self.gif_path:
+            return
+        threading.Thread(target=self.run_estimate, args=(self.estimate_key,), daemon=True).start()
+
+    def run_estimate(self, key):
+        """Encode a frame sample of each tile and report estimated sizes (worker thread).
+        
+        Args:
+            key: Settings snapshot as returned by get_estimate_key
+        """
+        rect, rows, cols, output_size, circular, remainder = key
+        try:
+            with self.estimate_lock:
+                if self.estimate_sample is None:
+                    # Only decode the sampled frames, spread evenly over the GIF
+                    total_frames = ResourceLimits.inspect(self.gif_path)[2]
+                    step = max(1, -(-total_frames // self.estimate_frames))
+                    frames, durations = zip(*GifProcessor.iter_frames(
+                        self.gif_path, step, max_frames=self.estimate_frames))
+                    self.estimate_sample = (frames, durations, total_frames)
+                frames, durations, total_frames = self.estimate_sample
+            processor = GifProcessor.from_frames(frames, durations)
+            processor.crop_to_rect(*rect)
+            if output_size:
+                processor.resize(*output_size)
+            if circular:
+                processor.crop_circle()
+            chunks = processor.split_gif(rows, cols, remainder)
+            sizes = processor.estimate_chunk_sizes(chunks, total_frames=total_frames)
+        except Exception:
+            return
+        # Picked up by animate() on the Tk thread
+        self.estimate_result = (key, sizes)
+
+    def apply_estimate(self):
+        """Show a finished estimate if it still matches the current settings."""
+        result = self.estimate_result
+        if result is None:
+            return
+        self.estimate_result = None
+        key, sizes = result
+        if key == self.estimate_key:
+            self.estimates = sizes
+            self.draw_grid()
 
     def animate(self):
         """Animate the GIF by updating the current frame."""
         if self.frames:
+            self.apply_estimate()
             self.current_frame = (self.current_frame + 1) % len(self.frames)
             self.show_frame()
             self.after(100, self.animate)
@@ -663,6 +850,8 @@ class PreviewWindow(tk.Toplevel):
             gif_path: Path to the GIF file to load
         """
         self.gif = Image.open(gif_path)
+        self.gif_path = gif_path
+        self.estimate_sample = None
         self.frames = []
         try:
             while True:
@@ -709,6 +898,8 @@ class PreviewWindow(tk.Toplevel):
     def on_closing(self):
         """Handle window closing events."""
         self.master.preview_window = None
+        if self.estimate_job:
+            self.after_cancel(self.estimate_job)
         self.destroy()
 
 if __name__ == '__main__':
@@ -0,0 +1,135 @@
+"""
+GIFshine headless preview
+Renders the selection, mask and grid overlay the GUI preview shows, without tkinter.
+
+Produces a downscaled, annotated poster frame and a low frame rate preview
+animation. Frames are decoded lazily, so only the frames that end up in the
+preview are kept.
+"""
+
+import os
+from typing import List, Optional, Tuple
+from PIL import Image, ImageDraw, ImageFilter
+from gif_processor import GifProcessor
+
+
+def grid_edges(rect: Tuple[int, int, int, int], rows: int, cols: int,
+               output_size: Optional[Tuple[int, int]] = None, remainder: str = 'drop',
+               row_bounds: Optional[List[int]] = None,
+               col_bounds: Optional[List[int]] = None) -> Tuple[List[float], List[float]]:
+    """Return the source-image x and y positions of the tile edges.
+
+    Edges are computed in output pixels, like split_gif does (explicit
+    row_bounds / col_bounds win over rows / cols), and mapped back onto the
+    selection rectangle (left, top, width, height).
+    """
+    left, top, width, height = rect
+    out_width, out_height = output_size or (width, height)
+    if col_bounds is None:
+        col_bounds = GifProcessor.grid_bounds(out_width, cols, remainder)
+    if row_bounds is None:
+        row_bounds = GifProcessor.grid_bounds(out_height, rows, remainder)
+    col_edges = [left + min(edge * width / out_width, width) for edge in col_bounds]
+    row_edges = [top + min(edge * height / out_height, height) for edge in row_bounds]
+    return col_edges, row_edges
+
+
+def mask_outline(size: Tuple[int, int], mask: str, mask_radius: int = 20,
+                 mask_path: Optional[str] = None,
+                 output_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Return an 'L' image of the mask's outline at the given (preview) size.
+
+    The mask comes from GifProcessor.create_mask at the size it is applied
+    at, so the outline matches whatever shape the processor will cut.
+    """
+    processor = GifProcessor.from_frames([], [])
+    source = processor.create_mask(output_size or size, mask, mask_radius, mask_path)
+    binary = source.resize(size, Image.Resampling.NEAREST).point(lambda value: 255 if value >= 128 else 0)
+    return binary.filter(ImageFilter.FIND_EDGES)
+
+
+def annotate(frame: Image.Image, rect: Tuple[int, int, int, int],
+             col_edges: List[float], row_edges: List[float], scale: float,
+             outline: Optional[Image.Image] = None) -> Image.Image:
+    """Downscale a frame and draw the selection, mask outline and grid on it.
+
+    outline is a mask_outline already sized to the scaled selection.
+    """
+    size = (max(1, round(frame.width * scale)), max(1, round(frame.height * scale)))
+    image = frame.convert('RGB').resize(size, Image.Resampling.BILINEAR)
+    draw = ImageDraw.Draw(image)
+
+    left, top, width, height = rect
+    box = (left * scale, top * scale, (left + width) * scale, (top + height) * scale)
+
+    # Selection in red, like the GUI preview
+    draw.rectangle(box, outline='red', width=2)
+    if outline is not None:
+        image.paste('red', (round(box[0]), round(box[1])), outline)
+
+    for x in col_edges[1:-1]:
+        draw.line((x * scale, box[1], x * scale, box[3]), fill='red', width=1)
+    for y in row_edges[1:-1]:
+        draw.line((box[0], y * scale, box[2], y * scale), fill='red', width=1)
+    return image
+
+
+def render_preview(input_path: str, output_path: str, rect: Tuple[int, int, int, int],
+                   rows: int, cols: int, mask: Optional[str] = None, mask_radius: int = 20,
+                   mask_path: Optional[str] = None,
+                   output_size: Optional[Tuple[int, int]] = None, remainder: str = 'drop',
+                   row_bounds: Optional[List[int]] = None, col_bounds: Optional[List[int]] = None,
+                   max_dim: int = 320, fps: int = 5, max_frames: int = 50) -> Tuple[str, str]:
+    """Write an annotated poster PNG and a low frame rate preview GIF.
+
+    output_path is the base path; '.png' and '.gif' are appended. Frames are
+    picked by elapsed time, so the animation keeps the source's timing even
+    when frame durations vary: the frame showing at every 1/fps tick is kept
+    and shown until the next kept frame. Stops after max_frames. Returns the
+    poster and animation paths.
+    """
+    with Image.open(input_path) as gif:
+        source_size = gif.size
+
+    scale = min(1.0, max_dim / max(source_size))
+    interval = 1000 / fps
+
+    # Overlays are the same on every frame, so work them out once
+    col_edges, row_edges = grid_edges(rect, rows, cols, output_size, remainder, row_bounds, col_bounds)
+    outline = None
+    if mask:
+        outline_size = (max(1, round(rect[2] * scale)), max(1, round(rect[3] * scale)))
+        outline = mask_outline(outline_size, mask, mask_radius, mask_path, output_size)
+
+    frames = []
+    durations = []
+    elapsed = 0
+    next_tick = 0
+    for frame, duration in GifProcessor.iter_frames(input_path):
+        if elapsed >= next_tick:
+            if len(frames) == max_frames:
+                break
+            frames.append(annotate(frame, rect, col_edges, row_edges, scale, outline))
+            durations.append(0)
+            while next_tick <= elapsed:
+                next_tick += interval
+        # Zero delays play at 100 ms in browsers
+        duration = duration or 100
+        durations[-1] += duration
+        elapsed += duration
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    poster_path = output_path + '.png'
+    frames[0].save(poster_path, format="PNG", optimize=True)
+
+    animation_path = output_path + '.gif'
+    frames[0].save(
+        animation_path,
+        format="GIF",
+        save_all=True,
+        append_images=frames[1:],
+        optimize=True,
+        duration=durations,
+        loop=0
+    )
+    return poster_path, animation_path
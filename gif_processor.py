@@ -1,67 +1,683 @@
 # -*- coding: utf-8 -*-
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageChops, ImageDraw, GifImagePlugin
+import PIL
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
 import os
-from typing import Tuple, List
+import queue
+import struct
+import tempfile
+import threading
+from typing import Tuple, List, Dict, Optional
+
+# Pillow decodes every frame after the first as RGB by default. Keep frames
+# that share the global palette in palette mode, so masking them doesn't
+# need a round trip through RGBA and re-quantization on save.
+GifImagePlugin.LOADING_STRATEGY = GifImagePlugin.LoadingStrategy.RGB_AFTER_DIFFERENT_PALETTE_ONLY
+
+
+def true_color(frame: Image.Image) -> Image.Image:
+    """Return a palette frame as RGB(A); Pillow only resizes palette images with NEAREST."""
+    if frame.mode != 'P':
+        return frame
+    return frame.convert('RGBA' if 'transparency' in frame.info else 'RGB')
+
+
+class PillowResizeBackend:
+    """Stock Pillow LANCZOS resize, one call per frame."""
+    name = 'pillow'
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def resize(self, frames: List[Image.Image], size: Tuple[int, int]) -> List[Image.Image]:
+        return [true_color(frame).resize(size, Image.Resampling.LANCZOS) for frame in frames]
+
+
+class PillowSimdResizeBackend(PillowResizeBackend):
+    """Same calls as stock Pillow, picked when the Pillow-SIMD fork is installed."""
+    name = 'pillow-simd'
+
+    @staticmethod
+    def available() -> bool:
+        # Pillow-SIMD releases are versioned as post releases, e.g. 9.0.0.post1
+        return '.post' in PIL.__version__
+
+
+class OpenCVResizeBackend:
+    """Batched resize of the frame stack with OpenCV.
+
+    Frames are stacked along the channel axis so each cv2.resize call handles
+    many RGBA frames at once, as many as fit in max_batch_bytes of float32
+    working memory (and at most 32). Shrinking uses INTER_AREA, which
+    anti-aliases like Pillow's LANCZOS does; enlarging uses INTER_LANCZOS4.
+    Colours are premultiplied by alpha around the resize, as Pillow does, so
+    transparent edges don't bleed colour.
+    """
+    name = 'opencv'
+    max_channels = 128  # CV_CN_MAX is 512 in OpenCV 4 but 128 in OpenCV 5
+    max_batch_bytes = 64 * 2**20
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            import cv2  # noqa: F401
+            import numpy  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def resize(self, frames: List[Image.Image], size: Tuple[int, int]) -> List[Image.Image]:
+        import cv2
+        import numpy as np
+
+        if not frames:
+            return []
+        width, height = frames[0].size
+        shrinking = size[0] < width or size[1] < height
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+        # float32 RGBA is 16 bytes per pixel, for the input and the resized stack
+        frame_bytes = 16 * (width * height + size[0] * size[1])
+        batch = max(1, min(self.max_channels // 4, self.max_batch_bytes // frame_bytes))
+
+        resized = []
+        for start in range(0, len(frames), batch):
+            # (height, width, frames, 4) viewed as (height, width, frames * 4) for cv2;
+            # filled in place so only one uint8 frame is converted at a time
+            chunk = frames[start:start + batch]
+            count = len(chunk)
+            stack = np.empty((height, width, count, 4), dtype=np.float32)
+            for i, frame in enumerate(chunk):
+                stack[:, :, i] = np.asarray(frame.convert('RGBA'))
+            stack[..., :3] *= stack[..., 3:] / 255
+            stack = cv2.resize(stack.reshape(height, width, count * 4), size,
+                               interpolation=interpolation).reshape(size[1], size[0], count, 4)
+
+            alpha = np.clip(stack[..., 3:], 0, 255)
+            np.divide(stack[..., :3] * 255, alpha, out=stack[..., :3], where=alpha > 0)
+            stack[..., :3] *= alpha > 0
+            stack[..., 3:] = alpha
+            stack = np.clip(np.rint(stack), 0, 255).astype(np.uint8)
+            resized.extend(Image.fromarray(np.ascontiguousarray(stack[:, :, i]), 'RGBA')
+                           for i in range(count))
+        return resized
+
+
+# Preferred first; the stock Pillow backend is always available as a fallback
+RESIZE_BACKENDS = [PillowSimdResizeBackend, OpenCVResizeBackend, PillowResizeBackend]
+
+
+def get_resize_backend(name: Optional[str] = None):
+    """Return the named resize backend, or the fastest available one.
+
+    Raises ValueError if a backend is requested by name but is unknown or
+    not installed.
+    """
+    for backend in RESIZE_BACKENDS:
+        if name in (None, 'auto'):
+            if backend.available():
+                return backend()
+        elif backend.name == name:
+            if not backend.available():
+                raise ValueError(f"Resize backend '{name}' is not available")
+            return backend()
+    raise ValueError(f"Unknown resize backend '{name}', expected one of "
+                     f"{', '.join(backend.name for backend in RESIZE_BACKENDS)}")
+
+
+# Read once at import: changing the umask is process-wide and not thread safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path: str, write):
+    """Call write(tmp_path) on a temporary file next to path, then rename it into place.
+
+    Readers (and re-runs after a crash) only ever see a complete file or none.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # mkstemp creates the file as 0600; give it the mode a plain open() would
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class JobManifest:
+    """Records which tiles of a job are finished, so a re-run can skip them.
+
+    The manifest lives in the output directory next to the tiles. It is only
+    trusted when it was written for the same params; otherwise the job starts
+    over. A tile counts as done when it is listed and its file still has the
+    recorded size. With resume=False any existing manifest is ignored and
+    overwritten, so every run leaves one behind for a later resume.
+    """
+    FILENAME = 'manifest.json'
+
+    def __init__(self, output_dir: str, params: dict, resume: bool = True):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        # Round-trip through JSON so tuples compare equal to the stored lists
+        self.params = json.loads(json.dumps(params))
+        self.quality = None
+        self.tiles: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if resume:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('params') == self.params:
+            self.quality = data.get('quality')
+            self.tiles = data.get('tiles', {})
+
+    def save(self):
+        data = {'params': self.params, 'quality': self.quality, 'tiles': self.tiles}
+
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        atomic_write(self.path, write)
+
+    def is_done(self, filename: str) -> bool:
+        tile = self.tiles.get(filename)
+        if tile is None:
+            return False
+        path = os.path.join(self.output_dir, filename)
+        return os.path.exists(path) and os.path.getsize(path) == tile.get('bytes')
+
+    def mark_done(self, filename: str):
+        with self._lock:
+            self.tiles[filename] = {'bytes': os.path.getsize(os.path.join(self.output_dir, filename))}
+            self.save()
+
+
+class ResourceLimitError(ValueError):
+    """Raised when an input GIF exceeds the configured ResourceLimits.
+
+    reducible is True when only the totals are over budget, so the GIF could
+    still be loaded with fewer or smaller frames (see ResourceLimits.plan),
+    and False when a single frame is already too large.
+    """
+
+    def __init__(self, message: str, reducible: bool):
+        super().__init__(message)
+        self.reducible = reducible
+
+
+class ResourceLimits:
+    """Admission limits for untrusted inputs, checked from the GIF headers before decoding.
+
+    Any limit left as None is not enforced; a limit of 0 rejects everything.
+    The working set estimate assumes RGBA frames held twice: the decoded
+    frames plus one transformed copy.
+    """
+    BYTES_PER_PIXEL = 4
+    WORKING_COPIES = 2
+
+    def __init__(self, max_frame_pixels: Optional[int] = None, max_total_pixels: Optional[int] = None,
+                 max_frames: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_frame_pixels = max_frame_pixels
+        self.max_total_pixels = max_total_pixels
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+
+    def estimate_bytes(self, frame_pixels: int, frame_count: int) -> int:
+        return frame_pixels * frame_count * self.BYTES_PER_PIXEL * self.WORKING_COPIES
+
+    @staticmethod
+    def inspect(input_path: str) -> Tuple[int, int, int]:
+        """Return (width, height, frame count) from the headers alone.
+
+        The frame count comes from skipping through the frame headers without
+        decoding any pixel data.
+        """
+        with Image.open(input_path) as gif:
+            return gif.size[0], gif.size[1], getattr(gif, 'n_frames', 1)
+
+    def check(self, input_path: str) -> Tuple[int, int, int]:
+        """Return (width, height, frame count), or raise ResourceLimitError."""
+        with Image.open(input_path) as gif:
+            width, height = gif.size
+            # Fail on the frame size before counting frames
+            self.validate(width, height, None)
+            frame_count = getattr(gif, 'n_frames', 1)
+        self.validate(width, height, frame_count)
+        return width, height, frame_count
+
+    def validate(self, width: int, height: int, frame_count: Optional[int]):
+        """Raise ResourceLimitError if the given stats are over a limit.
+
+        With frame_count None only the per-frame limit is checked.
+        """
+        frame_pixels = width * height
+        if self.max_frame_pixels is not None and frame_pixels > self.max_frame_pixels:
+            raise ResourceLimitError(
+                f"Frame size {width}x{height} exceeds the limit of {self.max_frame_pixels} pixels",
+                reducible=False)
+        if frame_count is None:
+            return
+        if self.max_frames is not None and frame_count > self.max_frames:
+            raise ResourceLimitError(
+                f"{frame_count} frames exceed the limit of {self.max_frames}", reducible=True)
+        if self.max_total_pixels is not None and frame_pixels * frame_count > self.max_total_pixels:
+            raise ResourceLimitError(
+                f"{frame_pixels * frame_count} decoded pixels exceed the limit of {self.max_total_pixels}",
+                reducible=True)
+        estimate = self.estimate_bytes(frame_pixels, frame_count)
+        if self.max_bytes is not None and estimate > self.max_bytes:
+            raise ResourceLimitError(
+                f"Estimated working set of {estimate // 2**20} MB exceeds the limit of {self.max_bytes // 2**20} MB",
+                reducible=True)
+
+    def plan(self, width: int, height: int, frame_count: int) -> Tuple[int, Tuple[int, int]]:
+        """Return (frame step, decoded frame size) that fits every total limit.
+
+        Frames are first subsampled to respect max_frames, then downscaled
+        until the kept frames fit the pixel and working set budgets. Raises
+        ResourceLimitError if not even a 1x1 frame would fit.
+        """
+        step = 1
+        if self.max_frames is not None:
+            if self.max_frames < 1:
+                raise ResourceLimitError("A frame limit of 0 rejects every input", reducible=False)
+            step = -(-frame_count // self.max_frames)
+        kept = -(-frame_count // step)
+
+        budget = width * height
+        if self.max_total_pixels is not None:
+            budget = min(budget, self.max_total_pixels // kept)
+        if self.max_bytes is not None:
+            budget = min(budget, self.max_bytes // (kept * self.BYTES_PER_PIXEL * self.WORKING_COPIES))
+        if budget < 1:
+            raise ResourceLimitError("Limits leave no room for even a 1x1 frame", reducible=False)
+
+        scale = min(1.0, (budget / (width * height)) ** 0.5)
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        # Rounding up to 1px on a thin side can overshoot; shrink the other side
+        while size[0] * size[1] > budget:
+            size = (max(1, size[0] - 1), max(1, size[1] - 1))
+        self.validate(size[0], size[1], kept)
+        return step, size
+
+
 class GifProcessor:
-    def __init__(self, input_path: str):
+    REMAINDER_MODES = ('drop', 'distribute', 'pad', 'last')
+    MASK_SHAPES = ('ellipse', 'rounded', 'image')
+    CLASSIFY_BATCH = 16  # frames compared per NumPy pass in classify_chunks
+
+    # Masks shared by all processors (and pipeline workers), keyed by shape
+    # parameters and size
+    _mask_cache: Dict[tuple, Image.Image] = {}
+    _mask_cache_limit = 32
+    _mask_cache_lock = threading.Lock()
+
+    def __init__(self, input_path: str, resize_backend: Optional[str] = None,
+                 limits: Optional[ResourceLimits] = None, over_limit: str = 'fail'):
+        """Open and decode a GIF.
+
+        With limits, the headers are checked before decoding. Inputs whose
+        totals are over budget raise ResourceLimitError, or with over_limit
+        'reduce' are decoded with every n-th frame and downscaled frames
+        (see ResourceLimits.plan), recorded in frame_step and decode_scale.
+        """
+        self.frame_step = 1
+        self.decoded_size = None
         self.gif = Image.open(input_path)
+        if limits is not None:
+            try:
+                # Fail on the frame size before counting frames, as check() does
+                limits.validate(*self.gif.size, None)
+                stats = (*self.gif.size, getattr(self.gif, 'n_frames', 1))
+                try:
+                    limits.validate(*stats)
+                except ResourceLimitError as e:
+                    if over_limit != 'reduce' or not e.reducible:
+                        raise
+                    self.frame_step, self.decoded_size = limits.plan(*stats)
+            except ResourceLimitError:
+                self.gif.close()
+                raise
+        self.decode_scale = self.decoded_size[0] / self.gif.size[0] if self.decoded_size else 1.0
         self.frames = []
         self.durations = []
+        self.resize_backend = resize_backend
         self.load_frames()
 
     def load_frames(self):
         try:
+            index = 0
             while True:
-                frame = self.gif.copy()
-                self.frames.append(frame)
-                self.durations.append(self.gif.info.get('duration', 100))
+                duration = self.gif.info.get('duration', 100)
+                if index % self.frame_step == 0:
+                    frame = self.gif.copy()
+                    if self.decoded_size:
+                        # Shrink right away so full size frames never pile up
+                        frame = true_color(frame).resize(self.decoded_size, Image.Resampling.LANCZOS)
+                    self.frames.append(frame)
+                    self.durations.append(duration)
+                else:
+                    # Skipped frames keep the animation's total length
+                    self.durations[-1] += duration
+                index += 1
                 self.gif.seek(self.gif.tell() + 1)
         except EOFError:
             pass
 
+    @staticmethod
+    def iter_frames(input_path: str, step: int = 1, max_frames: Optional[int] = None):
+        """Lazily yield (frame, duration) for every step-th frame of a GIF.
+
+        Frames are decoded on demand and only the yielded ones are copied, so
+        callers that need a few frames can stop early without loading the rest.
+        """
+        with Image.open(input_path) as gif:
+            index = 0
+            yielded = 0
+            try:
+                while max_frames is None or yielded < max_frames:
+                    if index % step == 0:
+                        yield gif.copy(), gif.info.get('duration', 100)
+                        yielded += 1
+                    index += 1
+                    gif.seek(index)
+            except EOFError:
+                pass
+
+    @classmethod
+    def from_frames(cls, frames: List[Image.Image], durations: List[int]) -> 'GifProcessor':
+        """Create a processor over already decoded frames without reopening the file"""
+        processor = cls.__new__(cls)
+        processor.gif = None
+        processor.frame_step = 1
+        processor.decoded_size = None
+        processor.decode_scale = 1.0
+        processor.resize_backend = None
+        processor.frames = list(frames)
+        processor.durations = list(durations)
+        return processor
+
+    def sample(self, max_frames: int) -> 'GifProcessor':
+        """Return a processor over at most max_frames evenly spaced frames"""
+        step = max(1, -(-len(self.frames) // max_frames))
+        return GifProcessor.from_frames(self.frames[::step], self.durations[::step])
+
     def resize(self, width: int, height: int):
-        self.frames = [frame.resize((width, height), Image.Resampling.LANCZOS) 
-                      for frame in self.frames]
+        """Resize all frames with the configured (or fastest available) backend.
+
+        The name of the backend actually used is stored in resize_backend.
+        """
+        backend = get_resize_backend(self.resize_backend)
+        self.frames = backend.resize(self.frames, (width, height))
+        self.resize_backend = backend.name
 
     def crop_to_rect(self, x: int, y: int, width: int, height: int):
-        """Crop all frames to the specified rectangle"""
+        """Crop all frames to the specified rectangle, given in source pixels"""
+        if self.decode_scale != 1.0:
+            # Frames were downscaled on decode; map the rectangle onto them
+            scale = self.decode_scale
+            x, y = round(x * scale), round(y * scale)
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
         self.frames = [frame.crop((x, y, x + width, y + height))
                       for frame in self.frames]
 
     def create_circular_mask(self, size: Tuple[int, int]) -> Image.Image:
-        mask = Image.new('L', size, 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0, size[0]-1, size[1]-1), fill=255)
+        return self.create_mask(size, 'ellipse')
+
+    def create_mask(self, size: Tuple[int, int], shape: str = 'ellipse', radius: int = 0,
+                    mask_path: Optional[str] = None) -> Image.Image:
+        """Return an 'L' mask (255 = keep) for the given shape, cached by its parameters.
+
+        shape is 'ellipse', 'rounded' (rectangle with corner radius) or 'image',
+        which loads mask_path as grayscale and scales it to size.
+        """
+        key = (shape, tuple(size), radius, mask_path)
+        if shape == 'image':
+            if not mask_path:
+                raise ValueError("An image mask requires a mask path")
+            key += (os.path.getmtime(mask_path),)
+        with self._mask_cache_lock:
+            mask = self._mask_cache.get(key)
+        if mask is not None:
+            return mask
+
+        # Built outside the lock; if two threads race, the first one cached wins
+        if shape == 'ellipse':
+            mask = Image.new('L', size, 0)
+            draw = ImageDraw.Draw(mask)
+            draw.ellipse((0, 0, size[0]-1, size[1]-1), fill=255)
+        elif shape == 'rounded':
+            mask = Image.new('L', size, 0)
+            draw = ImageDraw.Draw(mask)
+            draw.rounded_rectangle((0, 0, size[0]-1, size[1]-1), radius=radius, fill=255)
+        elif shape == 'image':
+            with Image.open(mask_path) as source:
+                mask = source.convert('L').resize(size, Image.Resampling.LANCZOS)
+        else:
+            raise ValueError(f"Unknown mask shape '{shape}', expected one of {', '.join(self.MASK_SHAPES)}")
+
+        with self._mask_cache_lock:
+            if key in self._mask_cache:
+                return self._mask_cache[key]
+            while len(self._mask_cache) >= self._mask_cache_limit:
+                self._mask_cache.pop(next(iter(self._mask_cache)))
+            self._mask_cache[key] = mask
         return mask
 
     def crop_circle(self):
-        mask = self.create_circular_mask(self.frames[0].size)
-        self.frames = [Image.composite(frame, 
-                                     Image.new('RGBA', frame.size, (0, 0, 0, 0)),
-                                     mask) 
-                      for frame in self.frames]
+        self.apply_mask('ellipse')
+
+    def apply_mask(self, shape: str = 'ellipse', radius: int = 0, mask_path: Optional[str] = None):
+        """Make everything outside the mask transparent on all frames.
+
+        Frames that still use the GIF's global palette (not resized, and not
+        decoded with a local palette) stay in palette mode: outside pixels are
+        mapped to the frame's transparent index, or to a free palette slot
+        reserved as one. Other frames get the mask merged into their alpha
+        channel, or when a palette frame has no free slot.
+        """
+        mask = self.create_mask(self.frames[0].size, shape, radius, mask_path)
+        # Binary version for palette frames, which have no partial transparency
+        outside = mask.point(lambda value: 255 if value < 128 else 0)
+        self.frames = [self._mask_frame(frame, mask, outside) for frame in self.frames]
+
+    def _mask_frame(self, frame: Image.Image, mask: Image.Image, outside: Image.Image) -> Image.Image:
+        if frame.mode == 'P':
+            index = self._transparent_index(frame)
+            if index is not None:
+                frame = frame.copy()
+                frame.paste(index, mask=outside)
+                frame.info['transparency'] = index
+                return frame
+        has_alpha = frame.mode in ('RGBA', 'LA', 'PA') or 'transparency' in frame.info
+        frame = frame.convert('RGBA')
+        if has_alpha:
+            frame.putalpha(ImageChops.multiply(frame.getchannel('A'), mask))
+        else:
+            frame.putalpha(mask)
+        return frame
+
+    def _transparent_index(self, frame: Image.Image) -> Optional[int]:
+        """Return the frame's transparent palette index, reserving an unused one if needed"""
+        index = frame.info.get('transparency')
+        if isinstance(index, int):
+            return index
+        histogram = frame.histogram()
+        for index, count in enumerate(histogram[:256]):
+            if count == 0:
+                return index
+        return None
 
-    def split_gif(self, rows: int, cols: int) -> List[List[List[Image.Image]]]:
+    @staticmethod
+    def grid_bounds(length: int, count: int, remainder: str = 'drop') -> List[int]:
+        """Return the count + 1 tile edges along one axis.
+
+        remainder decides what happens to the length % count leftover pixels:
+        'drop' cuts them off, 'distribute' spreads them one pixel at a time over
+        the tiles, 'pad' rounds the tile size up and pads the last tile, and
+        'last' lets the last tile absorb them. Raises ValueError when padding
+        would leave a tile made of nothing but padding.
+        """
+        if remainder == 'drop':
+            step = length // count
+            return [i * step for i in range(count + 1)]
+        if remainder == 'distribute':
+            return [i * length // count for i in range(count + 1)]
+        if remainder == 'pad':
+            step = -(-length // count)
+            if (count - 1) * step >= length:
+                raise ValueError(f"Cannot pad {length}px into {count} tiles without a tile of only padding")
+            return [i * step for i in range(count + 1)]
+        if remainder == 'last':
+            step = length // count
+            return [i * step for i in range(count)] + [length]
+        raise ValueError(f"Unknown remainder mode '{remainder}', expected one of {', '.join(GifProcessor.REMAINDER_MODES)}")
+
+    def _crop_padded(self, frame: Image.Image, box: Tuple[int, int, int, int]) -> Image.Image:
+        """Crop a box that may extend past the frame, padding with transparency.
+
+        Palette frames are padded with their transparent index (reserving a
+        free one if needed); everything else is padded as RGBA with alpha 0.
+        """
+        if box[2] <= frame.width and box[3] <= frame.height:
+            return frame.crop(box)
+        size = (box[2] - box[0], box[3] - box[1])
+        inside = frame.crop((box[0], box[1], min(box[2], frame.width), min(box[3], frame.height)))
+        index = self._transparent_index(frame) if frame.mode == 'P' else None
+        if index is not None:
+            padded = Image.new('P', size, index)
+            padded.putpalette(frame.getpalette())
+            padded.info = dict(frame.info)
+            padded.info['transparency'] = index
+        else:
+            padded = Image.new('RGBA', size, (0, 0, 0, 0))
+            inside = inside.convert('RGBA')
+        padded.paste(inside, (0, 0))
+        return padded
+
+    def _resolve_bounds(self, rows: int, cols: int, remainder: str,
+                        row_bounds: Optional[List[int]],
+                        col_bounds: Optional[List[int]]) -> Tuple[List[int], List[int]]:
+        """Return validated row and column tile edges for the current frame size"""
         width, height = self.frames[0].size
-        chunk_width = width // cols
-        chunk_height = height // rows
-        
+        if row_bounds is None:
+            row_bounds = self.grid_bounds(height, rows, remainder)
+        if col_bounds is None:
+            col_bounds = self.grid_bounds(width, cols, remainder)
+        for bounds, length in ((row_bounds, height), (col_bounds, width)):
+            if len(bounds) < 2 or bounds[0] < 0 or any(a >= b for a, b in zip(bounds, bounds[1:])):
+                raise ValueError(f"Invalid grid bounds {bounds}")
+            if remainder != 'pad' and bounds[-1] > length:
+                raise ValueError(f"Grid bounds {bounds} exceed the frame size of {length}px")
+            if bounds[-2] >= length:
+                raise ValueError(f"Grid bounds {bounds} leave a tile entirely outside the {length}px frame")
+        return row_bounds, col_bounds
+
+    def split_gif(self, rows: int, cols: int, remainder: str = 'drop',
+                  row_bounds: Optional[List[int]] = None,
+                  col_bounds: Optional[List[int]] = None) -> List[List[List[Image.Image]]]:
+        """Split all frames into a grid of chunks.
+
+        Uniform grids handle leftover pixels according to remainder (see
+        grid_bounds). Non-uniform grids can be given as explicit tile edges in
+        row_bounds / col_bounds, e.g. [0, 50, 120, 200], which override rows/cols.
+        """
+        row_bounds, col_bounds = self._resolve_bounds(rows, cols, remainder, row_bounds, col_bounds)
+
         chunks = []
-        for y in range(rows):
+        for top, bottom in zip(row_bounds, row_bounds[1:]):
             row_chunks = []
-            for x in range(cols):
-                left = x * chunk_width
-                top = y * chunk_height
-                chunk_frames = []
-                for frame in self.frames:
-                    chunk = frame.crop((left, top, left + chunk_width, top + chunk_height))
-                    chunk_frames.append(chunk)
-                row_chunks.append(chunk_frames)
+            for left, right in zip(col_bounds, col_bounds[1:]):
+                box = (left, top, right, bottom)
+                row_chunks.append([self._crop_padded(frame, box) for frame in self.frames])
             chunks.append(row_chunks)
         return chunks
 
-    def optimize_chunks(self, chunks: List[List[List[Image.Image]]], max_size: int) -> List[List[List[Image.Image]]]:
+    def classify_chunks(self, rows: int, cols: int, remainder: str = 'drop',
+                        row_bounds: Optional[List[int]] = None,
+                        col_bounds: Optional[List[int]] = None,
+                        mostly_static: float = 0.02) -> List[List[str]]:
+        """Classify each grid cell as 'static', 'mostly_static' or 'dynamic'.
+
+        Takes the same grid arguments as split_gif. Frames are compared
+        against the first frame with NumPy, a batch at a time, and changed
+        pixels are summed per cell with reduceat over the tile edges. Fully
+        transparent pixels count as equal whatever their colour. A cell is
+        static when no pixel ever changes, and mostly static when no frame
+        changes more than the mostly_static fraction of its pixels.
+        """
+        import numpy as np
+
+        row_bounds, col_bounds = self._resolve_bounds(rows, cols, remainder, row_bounds, col_bounds)
+        width, height = self.frames[0].size
+        rows, cols = len(row_bounds) - 1, len(col_bounds) - 1
+        if len(self.frames) < 2:
+            return [['static'] * cols for _ in range(rows)]
+
+        def pixels(frame):
+            # Palette and RGB frames disagree on the colour under alpha 0
+            array = np.array(frame.convert('RGBA'))
+            array[array[:, :, 3] == 0] = 0
+            return array
+
+        # Padded tiles extend past the frame; the padding never changes. The
+        # last reduceat segment runs to the end, so cut off dropped pixels
+        ys = np.minimum(row_bounds, height)
+        xs = np.minimum(col_bounds, width)
+        reference = pixels(self.frames[0])[:ys[-1], :xs[-1]]
+
+        peak_counts = np.zeros((rows, cols), dtype=np.uint32)
+        for start in range(1, len(self.frames), self.CLASSIFY_BATCH):
+            batch = np.stack([pixels(frame)[:ys[-1], :xs[-1]]
+                              for frame in self.frames[start:start + self.CLASSIFY_BATCH]])
+            changed = np.any(batch != reference, axis=3)
+            counts = np.add.reduceat(np.add.reduceat(changed, ys[:-1], axis=1, dtype=np.uint32),
+                                     xs[:-1], axis=2, dtype=np.uint32)
+            np.maximum(peak_counts, counts.max(axis=0), out=peak_counts)
+
+        areas = np.outer(np.diff(row_bounds), np.diff(col_bounds))
+        peak = peak_counts / areas
+
+        return [['static' if peak[row_idx, col_idx] == 0
+                 else 'mostly_static' if peak[row_idx, col_idx] <= mostly_static
+                 else 'dynamic'
+                 for col_idx in range(cols)]
+                for row_idx in range(rows)]
+
+    def optimize_chunks(self, chunks: List[List[List[Image.Image]]], max_size: int,
+                        states: Optional[List[List[str]]] = None) -> List[List[List[Image.Image]]]:
+        """Find the lowest quality at which every chunk fits max_size KB.
+
+        Chunks classified as 'static' in states (see classify_chunks) are
+        written as a single frame and are left out of the search; that frame
+        is encoded once and must fit max_size on its own.
+        """
+        probe = []
+        for row_idx, row in enumerate(chunks):
+            for col_idx, chunk_frames in enumerate(row):
+                if not (states and states[row_idx][col_idx] == 'static'):
+                    probe.append(chunk_frames)
+                    continue
+                static_bytes = self._get_compressed_size(chunk_frames[:1], 100)
+                if static_bytes > max_size * 1024:
+                    raise ValueError(f"Static tile chunk_{row_idx}_{col_idx}.gif is "
+                                     f"{static_bytes // 1024} KB, over the {max_size} KB limit")
+
         # Find the optimal quality setting that works for all chunks
         min_quality = 1
         max_quality = 100
@@ -72,10 +688,9 @@ class GifProcessor:
             max_chunk_size = 0
 
             # Test compression with current quality
-            for row in chunks:
-                for chunk_frames in row:
-                    test_bytes = self._get_compressed_size(chunk_frames, mid_quality)
-                    max_chunk_size = max(max_chunk_size, test_bytes)
+            for chunk_frames in probe:
+                test_bytes = self._get_compressed_size(chunk_frames, mid_quality)
+                max_chunk_size = max(max_chunk_size, test_bytes)
 
             if max_chunk_size > max_size * 1024:  # Convert max_size to bytes
                 min_quality = mid_quality + 1
@@ -105,22 +720,465 @@ class GifProcessor:
         )
         return buffer.tell()
 
-    def save_chunks(self, chunks: List[List[List[Image.Image]]], output_dir: str):
+    def estimate_chunk_sizes(self, chunks: List[List[List[Image.Image]]], total_frames: Optional[int] = None,
+                             quality: int = 85) -> List[List[int]]:
+        """Estimate the encoded size in bytes of each chunk.
+
+        When the chunks were split from a frame sample, pass the frame count of
+        the full GIF as total_frames to scale the estimate up accordingly.
+        """
+        sizes = []
+        for row in chunks:
+            row_sizes = []
+            for chunk_frames in row:
+                size = self._get_compressed_size(chunk_frames, quality)
+                if total_frames:
+                    size = size * total_frames // len(chunk_frames)
+                row_sizes.append(size)
+            sizes.append(row_sizes)
+        return sizes
+
+    def save_chunks(self, chunks: List[List[List[Image.Image]]], output_dir: str,
+                    manifest: Optional[JobManifest] = None,
+                    states: Optional[List[List[str]]] = None):
+        """Write each chunk as an animated GIF.
+
+        Tiles are written atomically. With a manifest, tiles it already lists
+        as done are skipped and newly written ones are recorded. Chunks marked
+        'static' in states are written as single-frame GIFs.
+        """
         os.makedirs(output_dir, exist_ok=True)
         
         for row_idx, row in enumerate(chunks):
             for col_idx, chunk_frames in enumerate(row):
-                output_path = os.path.join(
-                    output_dir, 
-                    f'chunk_{row_idx}_{col_idx}.gif'
-                )
-                chunk_frames[0].save(
-                    output_path,
-                    format="GIF",
-                    save_all=True,
-                    append_images=chunk_frames[1:],
-                    optimize=True,
-                    quality=getattr(self, 'optimal_quality', 85),
-                    duration=self.durations,
-                    loop=0
+                filename = f'chunk_{row_idx}_{col_idx}.gif'
+                if manifest and manifest.is_done(filename):
+                    continue
+                if states and states[row_idx][col_idx] == 'static':
+                    chunk_frames = chunk_frames[:1]
+                atomic_write(
+                    os.path.join(output_dir, filename),
+                    lambda tmp_path: chunk_frames[0].save(
+                        tmp_path,
+                        format="GIF",
+                        save_all=True,
+                        append_images=chunk_frames[1:],
+                        optimize=True,
+                        quality=getattr(self, 'optimal_quality', 85),
+                        duration=self.durations[:len(chunk_frames)],
+                        loop=0
+                    )
                 )
+                if manifest:
+                    manifest.mark_done(filename)
+
+    def save_sprite_sheets(self, chunks: List[List[List[Image.Image]]], output_dir: str,
+                           per_tile: bool = True, max_sheet_size: int = 4096) -> str:
+        """Pack chunk frames into PNG sprite sheets and write a JSON frame index.
+
+        With per_tile each chunk gets its own sheet(s), otherwise all chunks are
+        packed together. Sheets never exceed max_sheet_size on either side; extra
+        frames spill over into additional sheets. Returns the index path.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        if per_tile:
+            groups = [(f'chunk_{row_idx}_{col_idx}', [(row_idx, col_idx)])
+                      for row_idx, row in enumerate(chunks)
+                      for col_idx in range(len(row))]
+        else:
+            groups = [('atlas', [(row_idx, col_idx)
+                                 for row_idx, row in enumerate(chunks)
+                                 for col_idx in range(len(row))])]
+
+        sheets = []
+        tiles = []
+        for name, cells in groups:
+            entries = [(row_idx, col_idx, frame)
+                       for row_idx, col_idx in cells
+                       for frame in chunks[row_idx][col_idx]]
+            placements = self._pack_frames([frame.size for _, _, frame in entries], max_sheet_size)
+
+            # Allocate one canvas per sheet sized to its packed content
+            sheet_count = max(p[0] for p in placements) + 1
+            extents = [[1, 1] for _ in range(sheet_count)]
+            for (sheet, x, y), (_, _, frame) in zip(placements, entries):
+                extents[sheet][0] = max(extents[sheet][0], x + frame.width)
+                extents[sheet][1] = max(extents[sheet][1], y + frame.height)
+            images = [Image.new('RGBA', tuple(size), (0, 0, 0, 0)) for size in extents]
+
+            tile_index: Dict[Tuple[int, int], dict] = {}
+            for frame_idx, ((sheet, x, y), (row_idx, col_idx, frame)) in enumerate(zip(placements, entries)):
+                images[sheet].paste(frame.convert('RGBA'), (x, y))
+                tile = tile_index.setdefault((row_idx, col_idx),
+                                             {'row': row_idx, 'col': col_idx, 'frames': []})
+                tile['frames'].append({
+                    'sheet': len(sheets) + sheet,
+                    'x': x,
+                    'y': y,
+                    'w': frame.width,
+                    'h': frame.height,
+                    'duration': self.durations[len(tile['frames'])],
+                })
+
+            for sheet_idx, image in enumerate(images):
+                filename = f'{name}.png' if sheet_count == 1 else f'{name}_{sheet_idx}.png'
+                image.save(os.path.join(output_dir, filename), format="PNG", optimize=True)
+                sheets.append(filename)
+            tiles.extend(tile_index.values())
+
+        index_path = os.path.join(output_dir, 'atlas.json')
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump({'sheets': sheets, 'tiles': tiles}, f, indent=2)
+        return index_path
+
+    def _pack_frames(self, sizes: List[Tuple[int, int]], max_sheet_size: int) -> List[Tuple[int, int, int]]:
+        """Shelf-pack frame sizes into sheets, returning (sheet, x, y) per frame"""
+        placements = []
+        sheet = x = y = shelf_height = 0
+        for width, height in sizes:
+            if width > max_sheet_size or height > max_sheet_size:
+                raise ValueError(f"Frame of {width}x{height} does not fit in a {max_sheet_size}px sprite sheet")
+            if x + width > max_sheet_size:
+                # Start a new shelf below the current one
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+            if y + height > max_sheet_size:
+                # Current sheet is full
+                sheet += 1
+                x = y = shelf_height = 0
+            placements.append((sheet, x, y))
+            x += width
+            shelf_height = max(shelf_height, height)
+        return placements
+
+
+class GifStreamWriter:
+    """Writes an animated GIF one frame at a time.
+
+    Pillow's save_all keeps every frame until the file is closed. Here each
+    frame is encoded on its own and its blocks are appended straight away:
+    the first frame supplies the header and global palette, later frames
+    carry their palette as a local color table.
+    """
+
+    def __init__(self, fp, loop: int = 0, **params):
+        self.fp = fp
+        self.loop = loop
+        self.params = params
+        self.started = False
+
+    def write(self, frame: Image.Image):
+        buffer = io.BytesIO()
+        frame.save(buffer, format="GIF", duration=frame.info.get('duration', 100), **self.params)
+        data = buffer.getvalue()
+
+        screen = data[6:13]
+        table_size = 3 << ((screen[4] & 0x07) + 1) if screen[4] & 0x80 else 0
+        table = data[13:13 + table_size]
+        pos = 13 + table_size
+        control = b''
+        while data[pos] == 0x21:
+            end = self._skip_sub_blocks(data, pos + 2)
+            # Keep the graphic control block (duration, transparency) only
+            if data[pos + 1] == 0xF9:
+                control = data[pos:end]
+            pos = end
+        if data[pos] != 0x2C:
+            raise ValueError("Unexpected block in encoded GIF frame")
+        descriptor = bytearray(data[pos:pos + 10])
+        image_data = data[pos + 10:self._skip_sub_blocks(data, pos + 11)]
+
+        if not self.started:
+            self.fp.write(b'GIF89a' + screen + table)
+            self.fp.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', self.loop) + b'\x00')
+            self.fp.write(control + bytes(descriptor) + image_data)
+            self.started = True
+        elif descriptor[9] & 0x80:
+            # Already has a local color table
+            self.fp.write(control + bytes(descriptor) + image_data)
+        else:
+            # Move this frame's global palette into a local color table
+            descriptor[9] = (descriptor[9] & 0x40) | 0x80 | (screen[4] & 0x07)
+            self.fp.write(control + bytes(descriptor) + table + image_data)
+
+    def close(self):
+        if not self.started:
+            raise ValueError("Cannot write a GIF without frames")
+        self.fp.write(b';')
+
+    @staticmethod
+    def _skip_sub_blocks(data: bytes, pos: int) -> int:
+        """Return the position after the data sub-blocks starting at pos"""
+        while data[pos]:
+            pos += data[pos] + 1
+        return pos + 1
+
+
+class PipelineAborted(RuntimeError):
+    """Raised inside a GifPipeline stage when another stage has failed."""
+
+
+class GifPipeline:
+    """Streams a GIF through decode, transform and encode stages concurrently.
+
+    One thread decodes frames, a thread pool crops, resizes, masks and splits
+    them, and one encoder per tile appends each frame to its GIF as it arrives
+    (see GifStreamWriter), so encoding overlaps with decoding later frames.
+    Encoders don't keep written frames, so memory is bounded by the queues
+    between the stages rather than by the length of the animation.
+
+    There is no quality search here since it needs every frame up front; tiles
+    are written with a fixed quality.
+    """
+
+    def __init__(self, rows: int, cols: int, rect: Optional[Tuple[int, int, int, int]] = None,
+                 output_size: Optional[Tuple[int, int]] = None, mask: Optional[str] = None,
+                 mask_radius: int = 0, mask_path: Optional[str] = None, remainder: str = 'drop',
+                 row_bounds: Optional[List[int]] = None, col_bounds: Optional[List[int]] = None,
+                 quality: int = 85, workers: Optional[int] = None, queue_size: int = 8,
+                 resize_backend: Optional[str] = None):
+        # Explicit tile edges override the uniform grid, as in split_gif
+        self.rows = len(row_bounds) - 1 if row_bounds else rows
+        self.cols = len(col_bounds) - 1 if col_bounds else cols
+        self.row_bounds = row_bounds
+        self.col_bounds = col_bounds
+        self.rect = rect
+        self.output_size = output_size
+        self.mask = mask
+        self.mask_radius = mask_radius
+        self.mask_path = mask_path
+        self.remainder = remainder
+        self.quality = quality
+        self.workers = workers
+        self.queue_size = queue_size
+        self.resize_backend = resize_backend
+        self.join_timeout = 5.0
+        self._abort = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def run(self, input_path: str, output_dir: str, manifest: Optional[JobManifest] = None):
+        """Process input_path into tiles in output_dir.
+
+        With a manifest, tiles it already lists as done get no encoder, and
+        their frames are dropped after the split.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self._abort.clear()
+        self._error = None
+
+        # A None queue marks a tile that is already done
+        pending = queue.Queue(maxsize=self.queue_size)
+        tile_queues = [[None if manifest and manifest.is_done(f'chunk_{row_idx}_{col_idx}.gif')
+                        else queue.Queue(maxsize=self.queue_size)
+                        for col_idx in range(self.cols)]
+                       for row_idx in range(self.rows)]
+        todo = [(row_idx, col_idx)
+                for row_idx in range(self.rows)
+                for col_idx in range(self.cols)
+                if tile_queues[row_idx][col_idx] is not None]
+        if not todo:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as transform_pool, \
+                ThreadPoolExecutor(max_workers=len(todo)) as encode_pool:
+            encoders = [encode_pool.submit(self._encode, tile_queues[row_idx][col_idx], output_dir,
+                                           f'chunk_{row_idx}_{col_idx}.gif', manifest)
+                        for row_idx, col_idx in todo]
+            decoder = threading.Thread(target=self._decode, args=(input_path, transform_pool, pending),
+                                       daemon=True)
+            decoder.start()
+            try:
+                self._dispatch(pending, tile_queues)
+            except BaseException as e:
+                self._fail(e)
+            finally:
+                # Every blocking step in the decoder gives up shortly after an abort
+                decoder.join(timeout=self.join_timeout)
+            for encoder in encoders:
+                try:
+                    encoder.result()
+                except BaseException as e:
+                    self._fail(e)
+
+        if self._error is not None:
+            raise self._error
+
+    def _fail(self, error: BaseException):
+        """Record the first real failure and abort every stage"""
+        with self._error_lock:
+            if self._error is None and not isinstance(error, PipelineAborted):
+                self._error = error
+        self._abort.set()
+
+    def _put(self, target: queue.Queue, item):
+        """Blocking put that gives up once another stage has failed"""
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted("Pipeline aborted")
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _get(self, source: queue.Queue):
+        """Blocking get that gives up once another stage has failed"""
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted("Pipeline aborted")
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def _decode(self, input_path: str, pool: ThreadPoolExecutor, pending: queue.Queue):
+        """Decode frames in order and hand them to the transform pool"""
+        try:
+            for frame, duration in GifProcessor.iter_frames(input_path):
+                self._put(pending, pool.submit(self._transform, frame, duration))
+            self._put(pending, None)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+
+    def _transform(self, frame: Image.Image, duration: int) -> List[List[Image.Image]]:
+        """Apply the per-frame steps and split one frame into its tiles"""
+        processor = GifProcessor.from_frames([frame], [duration])
+        processor.resize_backend = self.resize_backend
+        if self.rect:
+            processor.crop_to_rect(*self.rect)
+        if self.output_size:
+            processor.resize(*self.output_size)
+        if self.mask:
+            processor.apply_mask(self.mask, self.mask_radius, self.mask_path)
+        tiles = [[chunk_frames[0] for chunk_frames in row]
+                 for row in processor.split_gif(self.rows, self.cols, self.remainder,
+                                                row_bounds=self.row_bounds, col_bounds=self.col_bounds)]
+        for row in tiles:
+            for tile in row:
+                tile.info['duration'] = duration
+        return tiles
+
+    def _dispatch(self, pending: queue.Queue, tile_queues: List[List[queue.Queue]]):
+        """Route transformed frames, in decode order, to the tile encoders"""
+        while True:
+            future = self._get(pending)
+            if future is None:
+                break
+            for row, row_queues in zip(future.result(), tile_queues):
+                for tile, tile_queue in zip(row, row_queues):
+                    if tile_queue is not None:
+                        self._put(tile_queue, tile)
+
+        # End of stream is only signalled once every frame went through, so
+        # an encoder never finishes a tile from a truncated stream
+        for row_queues in tile_queues:
+            for tile_queue in row_queues:
+                if tile_queue is not None:
+                    self._put(tile_queue, None)
+
+    def _frames(self, tile_queue: queue.Queue):
+        while True:
+            frame = self._get(tile_queue)
+            if frame is None:
+                return
+            yield frame
+
+    def _encode(self, tile_queue: queue.Queue, output_dir: str, filename: str,
+                manifest: Optional[JobManifest] = None):
+        """Write one tile's GIF, pulling frames as they become available.
+
+        The end of stream marker only arrives after every frame went through,
+        so a tile that gets written is complete and is recorded in the
+        manifest right away; a preempted run resumes from the finished tiles.
+        """
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as fp:
+                writer = GifStreamWriter(fp, loop=0, optimize=True, quality=self.quality)
+                for frame in self._frames(tile_queue):
+                    writer.write(frame)
+                writer.close()
+
+        try:
+            atomic_write(os.path.join(output_dir, filename), write)
+            if manifest:
+                manifest.mark_done(filename)
+        except BaseException as e:
+            self._fail(e)
+            raise
+
+
+class ProcessingSession:
+    """Keeps stage outputs between runs so that only stages downstream of a
+    changed setting are recomputed.
+
+    Each stage key embeds the key of the stage before it, so changing e.g. the
+    grid invalidates split and optimize but reuses the decoded, cropped and
+    resized frames. Only the latest result per stage is kept, and everything is
+    dropped when the input file (path or modification time) changes.
+    """
+
+    def __init__(self):
+        self.processor = None
+        self._source = None
+        self._cache = {}
+
+    def _load(self, input_path: str):
+        source = (os.path.abspath(input_path), os.path.getmtime(input_path))
+        if source != self._source:
+            self.processor = GifProcessor(input_path)
+            self._source = source
+            self._cache = {'load': (source, self.processor.frames)}
+        return source, self._cache['load'][1]
+
+    def _stage(self, name: str, key: tuple, compute):
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        result = compute()
+        self._cache[name] = (key, result)
+        return result
+
+    def _apply(self, frames: List[Image.Image], method, *args) -> List[Image.Image]:
+        """Run a frame-transforming processor method on the given frames"""
+        self.processor.frames = frames
+        method(*args)
+        return self.processor.frames
+
+    def run(self, input_path: str, rect: Tuple[int, int, int, int], rows: int, cols: int,
+            max_size: int, output_size: Optional[Tuple[int, int]] = None,
+            circular: bool = False, remainder: str = 'drop') -> List[List[List[Image.Image]]]:
+        """Crop, resize, circle, split and optimize, reusing unchanged stages.
+
+        Returns the optimized chunks; the session's processor carries the
+        matching durations and quality for save_chunks.
+        """
+        key, frames = self._load(input_path)
+        processor = self.processor
+
+        key = (key, 'crop', tuple(rect))
+        frames = self._stage('crop', key, lambda: self._apply(frames, processor.crop_to_rect, *rect))
+
+        if output_size:
+            key = (key, 'resize', tuple(output_size))
+            frames = self._stage('resize', key, lambda: self._apply(frames, processor.resize, *output_size))
+
+        if circular:
+            key = (key, 'circle')
+            frames = self._stage('circle', key, lambda: self._apply(frames, processor.crop_circle))
+        processor.frames = frames
+
+        key = (key, 'split', rows, cols, remainder)
+        chunks = self._stage('split', key, lambda: processor.split_gif(rows, cols, remainder))
+
+        key = (key, 'optimize', max_size)
+        processor.optimal_quality = self._stage('optimize', key, lambda: self._optimize(chunks, max_size))
+        return chunks
+
+    def _optimize(self, chunks: List[List[List[Image.Image]]], max_size: int) -> int:
+        self.processor.optimize_chunks(chunks, max_size)
+        return self.processor.optimal_quality